@@ -0,0 +1,48 @@
+"""
+Shared fixtures and fakes for the Weather MCP Server tests
+"""
+import functools
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict
+
+import httpx
+import msgspec
+
+
+@functools.lru_cache(maxsize=None)
+def load_fixture(name):
+    """Load and parse a JSON fixture file once per process; callers must treat the result as read-only"""
+    return msgspec.json.decode(Path(name).read_bytes())
+
+
+@dataclass(slots=True)
+class FakeResponse:
+    """Lightweight stand-in for httpx.Response exposing only what the server reads"""
+    status_code: int
+    content: bytes = b''
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise httpx.HTTPStatusError(f"HTTP {self.status_code}", request=None, response=self)
+
+
+def fake_response(payload, status_code=200, headers=None):
+    """Build a canned response around a JSON payload (or raw JSON bytes)"""
+    content = payload if isinstance(payload, bytes) else msgspec.json.encode(payload)
+    return FakeResponse(status_code, content, headers or {})
+
+
+# Matches the endpoint name in an OpenWeatherMap request URL
+_ENDPOINT_RE = re.compile(r"/(onecall|direct)\?")
+
+
+def router(routes, **overrides):
+    """Build a side_effect returning the canned response for each endpoint, with optional overrides"""
+    routes = {**routes, **overrides}
+
+    def side_effect(url, *args, **kwargs):
+        return routes[_ENDPOINT_RE.search(url).group(1)]
+    return side_effect
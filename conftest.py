@@ -0,0 +1,31 @@
+"""
+Shared pytest configuration for the Weather MCP Server tests
+"""
+import pytest
+
+from _fixtures import load_fixture
+from _mcp_stubs import install
+
+
+def pytest_configure(config):
+    """Install the mcp stubs once per session, before any test module is imported"""
+    install()
+
+
+@pytest.fixture(scope="session")
+def onecall_payload():
+    """Sample One Call response, parsed once per session; treat it as read-only"""
+    return load_fixture("test_weather_response.json")
+
+
+@pytest.fixture(autouse=True, scope="session")
+def _no_network():
+    """Fail any request that reaches the shared HTTP client without a test mock in place"""
+    import weather_mcp_server
+
+    async def unmocked_get(url, *args, **kwargs):
+        raise RuntimeError(f"Unmocked HTTP request to {url}")
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(weather_mcp_server._CLIENT, 'get', unmocked_get)
+        yield
@@ -5,11 +5,11 @@ Simple test script for the Weather MCP Server
 This script directly imports the functions from the weather_mcp_server.py
 file and tests them without going through the MCP server protocol.
 """
+import asyncio
 import os
-import sys
 from weather_mcp_server import get_current_weather, get_weather
 
-def main():
+async def main():
     """Test the weather server functions directly"""
     # Check if API key is set
     api_key = os.environ.get("OPENWEATHER_API_KEY")
@@ -24,9 +24,18 @@ def main():
     location = "New York"
     timezone_offset = -4
     
+    # Both tools are independent, so issue them concurrently
+    current_result, forecast_result = await asyncio.gather(
+        get_current_weather(location, api_key, timezone_offset),
+        get_weather(location, api_key, timezone_offset),
+        return_exceptions=True
+    )
+
     print(f"\nTesting get_current_weather for {location}...")
     try:
-        result = get_current_weather(location, api_key, timezone_offset)
+        if isinstance(current_result, Exception):
+            raise current_result
+        result = current_result
         
         if 'error' in result:
             print(f"Error: {result['error']}")
@@ -43,7 +52,9 @@ def main():
     
     print(f"\nTesting get_weather (8-day forecast) for {location}...")
     try:
-        result = get_weather(location, api_key, timezone_offset)
+        if isinstance(forecast_result, Exception):
+            raise forecast_result
+        result = forecast_result
         
         if 'error' in result:
             print(f"Error: {result['error']}")
@@ -59,12 +70,12 @@ def main():
                 print(f"Day {i+1} ({day['date']}): {day['summary']}")
                 
                 # Find the afternoon entry for a temperature estimate
-                afternoon_entries = [entry for entry in day['entries'] 
-                                    if '15:00:00' in entry['time']]
-                if afternoon_entries:
-                    temp = afternoon_entries[0]['temperature']
-                    condition = afternoon_entries[0]['weather_condition']
-                    pop = afternoon_entries[0].get('pop', 'N/A')
+                afternoon = next((entry for entry in day['entries']
+                                  if entry.get('hour_local') == 15), None)
+                if afternoon:
+                    temp = afternoon['temperature']
+                    condition = afternoon['weather_condition']
+                    pop = afternoon.get('pop', 'N/A')
                     print(f"  Afternoon: {temp}, {condition}, Precip: {pop}")
     except Exception as e:
         print(f"Error during execution: {str(e)}")
@@ -74,4 +85,4 @@ def main():
     print("\nTest complete")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file
@@ -2,436 +2,427 @@
 """
 Unit tests for the Weather MCP Server
 """
-import unittest
-from unittest.mock import patch, MagicMock
-import os
-from datetime import datetime, timezone, timedelta
+import asyncio
+from unittest.mock import AsyncMock
 import json
+from datetime import datetime, timedelta, timezone
 import sys
-import importlib.util
+import time
 
-# Create mock classes and modules needed for testing
-class MockField:
-    def __init__(self, *args, **kwargs):
-        self.description = kwargs.get('description', '')
+import httpx
+import pytest
 
-class MockBaseModel:
-    pass
+# Stand in for mcp and pydantic when they aren't installed
+from _mcp_stubs import install
+install()
+
+# Now import should work
+import weather_mcp_server
+from _fixtures import FakeResponse, fake_response, router
+
+# Sample test data
+TEST_LOCATION = "New York"
+TEST_API_KEY = "test_api_key_123"
+TEST_TIMEZONE_OFFSET = -4
+
+
+# Canned API responses, built once for the whole module
+_CURRENT = {
+    "dt": 1617979000,
+    "temp": 15.2,
+    "feels_like": 14.3,
+    "humidity": 76,
+    "wind_speed": 2.06,
+    "wind_deg": 210,
+    "weather": [{"description": "clear sky"}],
+    "clouds": 1
+}
+
+_DAILY = [
+    {
+        "dt": 1617979000,
+        "temp": {"day": 15.0, "min": 9.0, "max": 17.0, "eve": 13.0, "morn": 10.0},
+        "feels_like": {"day": 14.3, "night": 8.5, "eve": 12.5, "morn": 9.5},
+        "humidity": 76,
+        "wind_speed": 2.06,
+        "wind_deg": 210,
+        "weather": [{"description": "clear sky"}],
+        "clouds": 1,
+        "pop": 0.2,
+        "summary": "Nice day"
+    }
+]
+
+_HOURLY = [dict(_CURRENT, pop=0.2)]
+
+_ONECALL_HEADER = {
+    "lat": 40.7128,
+    "lon": -74.0060,
+    "timezone": "America/New_York",
+    "timezone_offset": -14400,
+}
+
+_GEO_RESP = fake_response([{"name": "New York", "lat": 40.7128, "lon": -74.0060}])
+_EMPTY_GEO_RESP = fake_response([])
+_ONECALL_RESP = fake_response(dict(_ONECALL_HEADER, current=_CURRENT, daily=_DAILY, hourly=_HOURLY))
+_ONECALL_CURRENT_ONLY_RESP = fake_response(dict(_ONECALL_HEADER, current=_CURRENT, daily=[], hourly=[]))
+
+# Default response for each API endpoint, keyed on the endpoint name in the request URL
+_URL_ROUTES = {"onecall": _ONECALL_RESP, "direct": _GEO_RESP}
+
+@pytest.fixture(autouse=True)
+def cold_caches():
+    """Start every test with cold geocoding and One Call caches"""
+    weather_mcp_server._GEO_CACHE.clear()
+    weather_mcp_server._ONECALL_CACHE.clear()
+
+
+@pytest.fixture
+def mock_get(monkeypatch):
+    """Replace the shared HTTP client's get with an AsyncMock"""
+    mock = AsyncMock()
+    monkeypatch.setattr(weather_mcp_server._CLIENT, 'get', mock)
+    return mock
 
-# Mock modules needed for testing
-sys.modules['mcp'] = MagicMock()
-sys.modules['mcp.server'] = MagicMock()
-sys.modules['mcp.server.fastmcp'] = MagicMock()
-sys.modules['mcp.server.fastmcp'].FastMCP = MagicMock()
-sys.modules['pydantic'] = MagicMock()
-sys.modules['pydantic'].BaseModel = MockBaseModel
-sys.modules['pydantic'].Field = MockField
 
-# Make mcp.tool() return the function itself, not a mock
-def mock_tool_decorator():
-    def decorator(func):
-        return func
-    return decorator
+def test_get_api_key_from_param():
+    """Test getting API key from parameter"""
+    api_key = weather_mcp_server.get_api_key(TEST_API_KEY)
+    assert api_key == TEST_API_KEY
 
-sys.modules['mcp.server.fastmcp'].FastMCP().tool = mock_tool_decorator
 
-# Now import should work
-import weather_mcp_server
+def test_get_api_key_from_env(monkeypatch):
+    """Test getting API key from environment variable"""
+    monkeypatch.setenv("OPENWEATHER_API_KEY", TEST_API_KEY)
+    api_key = weather_mcp_server.get_api_key()
+    assert api_key == TEST_API_KEY
+
+
+def test_get_api_key_missing(monkeypatch):
+    """Test error when API key is missing"""
+    monkeypatch.delenv("OPENWEATHER_API_KEY", raising=False)
+    with pytest.raises(ValueError):
+        weather_mcp_server.get_api_key()
+
+
+def test_build_url():
+    """Test that API URLs are built with URL-encoded query parameters"""
+    url = weather_mcp_server.build_url(
+        "onecall", lat=40.7128, lon=-74.006, appid="param_api_key", exclude="minutely,alerts"
+    )
+    assert url.startswith("https://api.openweathermap.org/data/3.0/onecall?")
+    assert "appid=param_api_key" in url
+    assert "exclude=minutely,alerts" in url
+
+    url = weather_mcp_server.build_url("direct", q="São Paulo", limit=1, appid=TEST_API_KEY)
+    assert "q=S%C3%A3o+Paulo" in url
+
+
+def test_decode_response():
+    """Test decoding a small geocoding response body with the server's decoder"""
+    response = fake_response(b'[{"name": "New York", "lat": 40.7128, "lon": -74.006}]')
+    data = weather_mcp_server.decode_response(response, weather_mcp_server._GEOCODING_DECODER)
+    assert data == [weather_mcp_server.Coordinates(lat=40.7128, lon=-74.006)]
+
+
+@pytest.mark.parametrize("cache_control, default, expected", [
+    ("public, max-age=300", 120, 300),
+    ("no-cache", 120, 0),
+    ("max-age=oops", 60, 60),
+    (None, 60, 60),
+])
+def test_get_ttl_for_cache_control_header(cache_control, default, expected):
+    """Test parsing of the One Call Cache-Control header into a cache lifetime"""
+    assert weather_mcp_server.get_ttl_for_cache_control_header(cache_control, default) == expected
+
+
+@pytest.mark.parametrize("tz_offset", [0, -4, 5.5, 8, -9.5, 14])
+def test_format_timestamp_matches_datetime(tz_offset):
+    """Test that the arithmetic timestamp formatter agrees with datetime.strftime"""
+    tz = timezone(timedelta(hours=tz_offset))
+    offset_sec = int(round(tz_offset * 3600))
+    for ts in (0, 1617979000, 1744128000, 1744171199, 1744171200, 4102444799):
+        expected = datetime.fromtimestamp(ts, tz).strftime('%Y-%m-%d %H:%M:%S')
+        assert weather_mcp_server.format_timestamp(ts, offset_sec) == expected
+
+
+def test_nearby_coordinates_share_onecall_response(mock_get):
+    """Test that coordinates within the One Call rounding precision reuse one cached response"""
+    mock_get.side_effect = router(_URL_ROUTES)
+
+    asyncio.run(weather_mcp_server.get_onecall_data(40.7128, -74.0060, TEST_API_KEY))
+    asyncio.run(weather_mcp_server.get_onecall_data(40.7131, -74.0058, TEST_API_KEY))
+
+    assert mock_get.call_count == 1
+    assert "lat=40.71&lon=-74.01" in mock_get.call_args.args[0]
+
+
+def test_transient_errors_are_retried(mock_get, monkeypatch):
+    """Test that 5xx responses and failed connections are retried before succeeding"""
+    monkeypatch.setattr(weather_mcp_server, '_RETRY_BACKOFF', 0)
+    mock_get.side_effect = [FakeResponse(503), httpx.ConnectError("refused"), _GEO_RESP]
+
+    coords = asyncio.run(weather_mcp_server.get_coordinates(TEST_LOCATION, TEST_API_KEY))
+
+    assert coords == (40.7128, -74.0060)
+    assert mock_get.call_count == 3
+
+
+def test_retries_give_up_after_max_attempts(mock_get, monkeypatch):
+    """Test that a persistent rate limit is reported once the retries are used up"""
+    monkeypatch.setattr(weather_mcp_server, '_RETRY_BACKOFF', 0)
+    mock_get.return_value = FakeResponse(429)
+
+    result = asyncio.run(weather_mcp_server.get_current_weather(TEST_LOCATION, TEST_API_KEY))
+
+    assert result['error'].startswith("Request error")
+    assert mock_get.call_count == weather_mcp_server._MAX_RETRIES + 1
+
+
+def test_rate_limit_retry_after_is_honoured(mock_get, monkeypatch):
+    """Test that a 429 is retried after the delay in its Retry-After header, not the backoff"""
+    sleep = AsyncMock()
+    monkeypatch.setattr(weather_mcp_server.asyncio, 'sleep', sleep)
+    mock_get.side_effect = [FakeResponse(429, headers={'retry-after': '2'}), _GEO_RESP]
+
+    coords = asyncio.run(weather_mcp_server.get_coordinates(TEST_LOCATION, TEST_API_KEY))
+
+    assert coords == (40.7128, -74.0060)
+    sleep.assert_awaited_once_with(2)
+
+
+def test_long_retry_after_is_not_waited_for(mock_get, monkeypatch):
+    """Test that a 429 asking to retry later than _MAX_RETRY_AFTER is reported at once"""
+    sleep = AsyncMock()
+    monkeypatch.setattr(weather_mcp_server.asyncio, 'sleep', sleep)
+    mock_get.return_value = FakeResponse(429, headers={'retry-after': '60'})
+
+    result = asyncio.run(weather_mcp_server.get_current_weather(TEST_LOCATION, TEST_API_KEY))
+
+    assert result['error'].startswith("Request error")
+    assert mock_get.call_count == 1
+    sleep.assert_not_awaited()
+
+
+@pytest.mark.parametrize("header, expected", [("3", 3), (None, None), ("Wed, 21 Oct 2015 07:28:00 GMT", None)])
+def test_get_retry_after(header, expected):
+    """Test parsing of the Retry-After header into a delay in seconds"""
+    assert weather_mcp_server.get_retry_after(header) == expected
+
+
+def test_concurrent_lookups_share_upstream_requests(mock_get):
+    """Test that concurrent forecasts for the same location send one geocoding and one One Call request"""
+    route = router(_URL_ROUTES)
+
+    async def slow_get(url, *args, **kwargs):
+        await asyncio.sleep(0)  # Let the other lookup start while this request is in flight
+        return route(url)
+
+    mock_get.side_effect = slow_get
+
+    result = asyncio.run(weather_mcp_server.get_weather_many([TEST_LOCATION, " new york "], TEST_API_KEY))
+
+    assert all('error' not in forecast for forecast in result.values())
+    assert mock_get.call_count == 2
+    assert not weather_mcp_server._IN_FLIGHT
+
+
+def test_many_locations_are_looked_up_a_few_at_a_time(mock_get, monkeypatch):
+    """Test that get_weather_many keeps at most _LOOKUP_CONCURRENCY lookups in flight"""
+    monkeypatch.setattr(weather_mcp_server, '_LOOKUP_SEMAPHORE', asyncio.Semaphore(2))
+    route = router(_URL_ROUTES)
+    in_flight = peak = 0
+
+    async def slow_get(url, *args, **kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0)  # Give the other lookups a chance to start
+        in_flight -= 1
+        return route(url)
+
+    mock_get.side_effect = slow_get
+    locations = [f"City {i}" for i in range(6)]
+
+    result = asyncio.run(weather_mcp_server.get_weather_many(locations, TEST_API_KEY))
+
+    assert list(result) == locations
+    assert all('error' not in forecast for forecast in result.values())
+    assert peak == 2
+
+
+def test_too_many_locations_are_refused(mock_get, monkeypatch):
+    """Test that get_weather_many refuses more than _MAX_LOCATIONS locations without any requests"""
+    monkeypatch.setattr(weather_mcp_server, '_MAX_LOCATIONS', 2)
+
+    result = asyncio.run(weather_mcp_server.get_weather_many(["A", "B", "C"], TEST_API_KEY))
+
+    assert result['error'].startswith("Too many locations")
+    mock_get.assert_not_called()
+
+
+def test_get_weather_success(mock_get):
+    """Test successful weather forecast retrieval"""
+    mock_get.side_effect = router(_URL_ROUTES)
+
+    # Call the function with test data
+    result = asyncio.run(weather_mcp_server.get_weather(TEST_LOCATION, TEST_API_KEY, TEST_TIMEZONE_OFFSET))
+
+    # Check the result
+    assert {'daily_forecasts', 'current'} <= result.keys()
+    assert len(result['daily_forecasts']) > 0
+
+    # Verify daily forecast structure
+    first_day = result['daily_forecasts'][0]
+    assert {'date', 'entries', 'summary'} <= first_day.keys()
+
+    # Every entry carries its local hour as an integer matching the formatted time
+    for entry in first_day['entries']:
+        assert entry['hour_local'] == int(entry['time'][11:13])
+
+
+def test_hourly_entries_limited_to_48_hours(mock_get):
+    """Test that hourly forecasts more than 48 hours ahead are left out"""
+    now = int(time.time())
+    near, far = now + 3600, now + 72 * 3600
+    mock_get.side_effect = router(_URL_ROUTES, onecall=fake_response(dict(
+        _ONECALL_HEADER,
+        current=_CURRENT,
+        daily=[dict(_DAILY[0], dt=near), dict(_DAILY[0], dt=far)],
+        hourly=[dict(_HOURLY[0], dt=near), dict(_HOURLY[0], dt=far)],
+    )))
+
+    result = asyncio.run(weather_mcp_server.get_weather(TEST_LOCATION, TEST_API_KEY))
+
+    epochs = [entry['epoch'] for day in result['daily_forecasts'] for entry in day['entries']]
+    assert epochs.count(near) == 2  # daily entry plus hourly entry
+    assert epochs.count(far) == 1  # daily entry only
+
+
+def test_get_current_weather_success(mock_get):
+    """Test successful current weather retrieval"""
+    mock_get.side_effect = router(_URL_ROUTES, onecall=_ONECALL_CURRENT_ONLY_RESP)
+
+    # Call the function
+    result = asyncio.run(weather_mcp_server.get_current_weather(TEST_LOCATION, TEST_API_KEY, TEST_TIMEZONE_OFFSET))
+
+    # Verify the structure of the returned data
+    assert {'time', 'temperature', 'weather_condition'} <= result.keys()
+    assert result['weather_condition'] == 'clear sky'
+
+
+def test_only_current_skips_forecast(mock_get):
+    """Test that only_current returns just the current weather, even if forecast data comes back"""
+    mock_get.side_effect = router(_URL_ROUTES)
+
+    # Call the function
+    result = asyncio.run(weather_mcp_server.get_weather_forecast(
+        TEST_LOCATION, TEST_TIMEZONE_OFFSET, TEST_API_KEY, only_current=True
+    ))
+
+    # Verify no forecast was built
+    assert list(result) == ['current']
+    assert result['current']['weather_condition'] == 'clear sky'
+
+
+def test_msgspec_decoding_matches_stdlib(mock_get, onecall_payload):
+    """Test that raw One Call bytes decoded with msgspec match the stdlib json parse"""
+    with open("test_weather_response.json", "rb") as f:
+        raw_onecall = f.read()
+    assert onecall_payload == json.loads(raw_onecall)
+
+    # Feed the real response bytes through the server's decoding path
+    mock_get.side_effect = router(_URL_ROUTES, onecall=fake_response(raw_onecall))
+
+    result = asyncio.run(weather_mcp_server.get_current_weather(TEST_LOCATION, TEST_API_KEY, TEST_TIMEZONE_OFFSET))
+
+    current = onecall_payload['current']
+    assert result['temperature'] == f"{current['temp']} °C"
+    assert result['weather_condition'] == current['weather'][0]['description']
+
+
+def test_onecall_schema_drift(mock_get):
+    """Test that a One Call field with an unexpected type is reported as a data structure error"""
+    drifted_response = fake_response({"current": {"dt": 1617979000, "temp": "warm"}})
+    mock_get.side_effect = router(_URL_ROUTES, onecall=drifted_response)
+
+    result = asyncio.run(weather_mcp_server.get_current_weather(TEST_LOCATION, TEST_API_KEY))
+
+    assert 'error' in result
+    assert result['error'].startswith("Data structure error")
+    assert "$.current.temp" in result['error']
+
+
+def test_api_error_handling(mock_get):
+    """Test error handling for API failures"""
+    # Mock an API error response
+    mock_get.return_value = FakeResponse(401)
+
+    # Call the function
+    result = asyncio.run(weather_mcp_server.get_weather(TEST_LOCATION, TEST_API_KEY, TEST_TIMEZONE_OFFSET))
+
+    # Verify error is returned
+    assert 'error' in result
+
+
+def test_env_variable_priority(monkeypatch):
+    """Test that provided API key takes priority over environment variable"""
+    monkeypatch.setenv("OPENWEATHER_API_KEY", "env_api_key")
+    api_key = weather_mcp_server.get_api_key("provided_api_key")
+    assert api_key == "provided_api_key"
+
+
+def test_transport_error_handling(mock_get, monkeypatch):
+    """Test that a connection failure during the location lookup is reported as a request error"""
+    monkeypatch.setattr(weather_mcp_server, '_RETRY_BACKOFF', 0)
+    mock_get.side_effect = httpx.ConnectError("connection refused")
+
+    # Call the function
+    result = asyncio.run(weather_mcp_server.get_weather(TEST_LOCATION, TEST_API_KEY))
+
+    # Verify error is returned
+    assert result['error'].startswith("Request error")
+
+
+def test_get_current_weather_error_propagation(monkeypatch):
+    """Test that errors from get_weather_forecast are propagated to get_current_weather"""
+    # Mock an error from get_weather_forecast
+    monkeypatch.setattr(weather_mcp_server, 'get_weather_forecast', AsyncMock(return_value={"error": "Test error"}))
+
+    # Call get_current_weather
+    result = asyncio.run(weather_mcp_server.get_current_weather(TEST_LOCATION, TEST_API_KEY, TEST_TIMEZONE_OFFSET))
+
+    # Verify error is propagated
+    assert 'error' in result
+    assert result['error'] == "Test error"
+
+
+def test_get_current_weather_missing_current(monkeypatch):
+    """Test handling when get_weather_forecast returns data without 'current' field"""
+    # Mock results from get_weather_forecast without 'current' field
+    monkeypatch.setattr(weather_mcp_server, 'get_weather_forecast', AsyncMock(return_value={
+        "daily_forecasts": [{"date": "2023-01-01", "entries": [], "summary": ""}]
+    }))
+
+    # Call get_current_weather
+    result = asyncio.run(weather_mcp_server.get_current_weather(TEST_LOCATION, TEST_API_KEY, TEST_TIMEZONE_OFFSET))
+
+    # Verify error is returned
+    assert 'error' in result
+    assert result['error'] == "Unable to get current weather information"
+
+
+def test_empty_geocoding_result_is_location_not_found(mock_get):
+    """Test that an empty geocoding result reports the location as not found without further requests"""
+    mock_get.side_effect = router(_URL_ROUTES, direct=_EMPTY_GEO_RESP)
 
+    # Call the function
+    result = asyncio.run(weather_mcp_server.get_weather("NonExistentLocation", TEST_API_KEY, TEST_TIMEZONE_OFFSET))
 
-class TestWeatherMCP(unittest.TestCase):
-    """Test the Weather MCP server functionality"""
-
-    def setUp(self):
-        """Set up test environment"""
-        # Clear environment variable to ensure tests control it
-        if "OPENWEATHER_API_KEY" in os.environ:
-            self.original_api_key = os.environ["OPENWEATHER_API_KEY"]
-            del os.environ["OPENWEATHER_API_KEY"]
-        else:
-            self.original_api_key = None
-
-        # Sample test data
-        self.test_location = "New York"
-        self.test_api_key = "test_api_key_123"
-        self.test_timezone_offset = -4
-
-        # Sample response data
-        with open("test_weather_response.json") as f:
-            self.sample_onecall_data = json.load(f)
-
-        # Sample current weather response
-        self.sample_current_weather = {
-            "coord": {"lon": -74.006, "lat": 40.7128},
-            "weather": [{"id": 800, "main": "Clear", "description": "clear sky", "icon": "01d"}],
-            "base": "stations",
-            "main": {
-                "temp": 5.46,
-                "feels_like": 0.42,
-                "temp_min": 4.0,
-                "temp_max": 6.5,
-                "pressure": 1006,
-                "humidity": 36
-            },
-            "visibility": 10000,
-            "wind": {"speed": 9.17, "deg": 298},
-            "clouds": {"all": 20},
-            "dt": 1744128000,
-            "sys": {
-                "type": 2,
-                "id": 2039034,
-                "country": "US",
-                "sunrise": 1744108059,
-                "sunset": 1744154851
-            },
-            "timezone": -14400,
-            "id": 5128581,
-            "name": "New York",
-            "cod": 200
-        }
-
-    def tearDown(self):
-        """Clean up after tests"""
-        # Restore original environment if it existed
-        if self.original_api_key is not None:
-            os.environ["OPENWEATHER_API_KEY"] = self.original_api_key
-        elif "OPENWEATHER_API_KEY" in os.environ:
-            del os.environ["OPENWEATHER_API_KEY"]
-
-    def test_get_api_key_from_param(self):
-        """Test getting API key from parameter"""
-        api_key = weather_mcp_server.get_api_key(self.test_api_key)
-        self.assertEqual(api_key, self.test_api_key)
-
-    def test_get_api_key_from_env(self):
-        """Test getting API key from environment variable"""
-        os.environ["OPENWEATHER_API_KEY"] = self.test_api_key
-        api_key = weather_mcp_server.get_api_key()
-        self.assertEqual(api_key, self.test_api_key)
-
-    def test_get_api_key_missing(self):
-        """Test error when API key is missing"""
-        with self.assertRaises(ValueError):
-            weather_mcp_server.get_api_key()
-
-    @patch('weather_mcp_server.requests.get')
-    def test_get_weather_success(self, mock_get):
-        """Test successful weather forecast retrieval"""
-        # Mock the geocoding API response
-        mock_geocoding_response = MagicMock()
-        mock_geocoding_response.status_code = 200
-        mock_geocoding_response.json.return_value = [
-            {"name": "New York", "lat": 40.7128, "lon": -74.0060}
-        ]
-
-        # Mock the One Call API response
-        mock_onecall_response = MagicMock()
-        mock_onecall_response.status_code = 200
-        mock_onecall_response.json.return_value = {
-            "lat": 40.7128,
-            "lon": -74.0060,
-            "timezone": "America/New_York",
-            "timezone_offset": -14400,
-            "current": {
-                "dt": 1617979000,
-                "temp": 15.2,
-                "feels_like": 14.3,
-                "humidity": 76,
-                "wind_speed": 2.06,
-                "wind_deg": 210,
-                "weather": [{"description": "clear sky"}],
-                "clouds": 1
-            },
-            "daily": [
-                {
-                    "dt": 1617979000,
-                    "temp": {"day": 15.0, "min": 9.0, "max": 17.0, "eve": 13.0, "morn": 10.0},
-                    "feels_like": {"day": 14.3, "night": 8.5, "eve": 12.5, "morn": 9.5},
-                    "humidity": 76,
-                    "wind_speed": 2.06,
-                    "wind_deg": 210,
-                    "weather": [{"description": "clear sky"}],
-                    "clouds": 1,
-                    "pop": 0.2,
-                    "summary": "Nice day"
-                }
-            ],
-            "hourly": [
-                {
-                    "dt": 1617979000,
-                    "temp": 15.2,
-                    "feels_like": 14.3,
-                    "humidity": 76,
-                    "wind_speed": 2.06,
-                    "wind_deg": 210,
-                    "weather": [{"description": "clear sky"}],
-                    "clouds": 1,
-                    "pop": 0.2
-                }
-            ]
-        }
-
-        # Configure the mock to return different responses for different URLs
-        def side_effect(url, *args, **kwargs):
-            if "onecall" in url:
-                return mock_onecall_response
-            elif "geo" in url:
-                return mock_geocoding_response
-            else:
-                # Fallback to current weather API for coordinates
-                return mock_geocoding_response
-
-        mock_get.side_effect = side_effect
-
-        # Call the function with test data
-        result = weather_mcp_server.get_weather(
-            self.test_location,
-            self.test_api_key,
-            self.test_timezone_offset
-        )
-
-        # Check the result
-        self.assertIn('daily_forecasts', result)
-        self.assertIn('current', result)
-        self.assertTrue(len(result['daily_forecasts']) > 0)
-
-        # Verify API was called with the right parameters
-        mock_get.assert_called()
-
-        # Verify the structure of the returned data
-        self.assertIn('time', result['current'])
-        self.assertIn('temperature', result['current'])
-        self.assertIn('weather_condition', result['current'])
-
-        # Verify daily forecast structure
-        first_day = result['daily_forecasts'][0]
-        self.assertIn('date', first_day)
-        self.assertIn('entries', first_day)
-        self.assertIn('summary', first_day)
-
-    @patch('weather_mcp_server.requests.get')
-    def test_get_current_weather_success(self, mock_get):
-        """Test successful current weather retrieval"""
-        # Mock the geocoding API response
-        mock_geocoding_response = MagicMock()
-        mock_geocoding_response.status_code = 200
-        mock_geocoding_response.json.return_value = [
-            {"name": "New York", "lat": 40.7128, "lon": -74.0060}
-        ]
-
-        # Mock the One Call API response
-        mock_onecall_response = MagicMock()
-        mock_onecall_response.status_code = 200
-        mock_onecall_response.json.return_value = {
-            "lat": 40.7128,
-            "lon": -74.0060,
-            "timezone": "America/New_York",
-            "timezone_offset": -14400,
-            "current": {
-                "dt": 1617979000,
-                "temp": 15.2,
-                "feels_like": 14.3,
-                "humidity": 76,
-                "wind_speed": 2.06,
-                "wind_deg": 210,
-                "weather": [{"description": "clear sky"}],
-                "clouds": 1
-            },
-            "daily": [],
-            "hourly": []
-        }
-
-        # Configure the mock to return different responses for different URLs
-        def side_effect(url, *args, **kwargs):
-            if "onecall" in url:
-                return mock_onecall_response
-            elif "geo" in url:
-                return mock_geocoding_response
-            else:
-                # Fallback to current weather API for coordinates
-                return mock_geocoding_response
-
-        mock_get.side_effect = side_effect
-
-        # Call the function
-        result = weather_mcp_server.get_current_weather(
-            self.test_location,
-            self.test_api_key,
-            self.test_timezone_offset
-        )
-
-        # Verify the structure of the returned data
-        self.assertIn('time', result)
-        self.assertIn('temperature', result)
-        self.assertIn('weather_condition', result)
-        self.assertEqual(result['weather_condition'], 'clear sky')
-
-    @patch('weather_mcp_server.requests.get')
-    def test_api_error_handling(self, mock_get):
-        """Test error handling for API failures"""
-        # Mock an API error response
-        mock_response = MagicMock()
-        mock_response.status_code = 401
-        mock_response.raise_for_status.side_effect = Exception("API Error")
-        mock_get.return_value = mock_response
-
-        # Call the function
-        result = weather_mcp_server.get_weather(
-            self.test_location,
-            self.test_api_key,
-            self.test_timezone_offset
-        )
-
-        # Verify error is returned
-        self.assertIn('error', result)
-
-    def test_env_variable_priority(self):
-        """Test that provided API key takes priority over environment variable"""
-        os.environ["OPENWEATHER_API_KEY"] = "env_api_key"
-        api_key = weather_mcp_server.get_api_key("provided_api_key")
-        self.assertEqual(api_key, "provided_api_key")
-
-    @patch('weather_mcp_server.requests.get')
-    def test_location_not_found(self, mock_get):
-        """Test handling when location is not found"""
-        # Mock the geo API response for location not found
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = []  # Empty response means location not found
-        mock_get.return_value = mock_response
-
-        # Since we're using a new get_coordinates function, we need to mock how it raises the exception
-        mock_get.side_effect = KeyError("coord")
-
-        # Call the function
-        result = weather_mcp_server.get_weather("NonExistentLocation", self.test_api_key)
-
-        # Verify error is returned
-        self.assertIn('error', result)
-
-    @patch('weather_mcp_server.get_weather')
-    def test_get_current_weather_error_propagation(self, mock_get_weather):
-        """Test that errors from get_weather are propagated to get_current_weather"""
-        # Mock an error from get_weather
-        mock_get_weather.return_value = {"error": "Test error"}
-
-        # Call get_current_weather
-        result = weather_mcp_server.get_current_weather(
-            self.test_location,
-            self.test_api_key,
-            self.test_timezone_offset
-        )
-
-        # Verify error is propagated
-        self.assertIn('error', result)
-        self.assertEqual(result['error'], "Test error")
-
-    @patch('weather_mcp_server.get_weather')
-    def test_get_current_weather_missing_current(self, mock_get_weather):
-        """Test handling when get_weather returns data without 'current' field"""
-        # Mock results from get_weather without 'current' field
-        mock_get_weather.return_value = {
-            "daily_forecasts": [{"date": "2023-01-01", "entries": [], "summary": ""}]
-        }
-
-        # Call get_current_weather
-        result = weather_mcp_server.get_current_weather(
-            self.test_location,
-            self.test_api_key,
-            self.test_timezone_offset
-        )
-
-        # Verify error is returned
-        self.assertIn('error', result)
-        self.assertEqual(result['error'], "Unable to get current weather information")
-
-    @patch('weather_mcp_server.requests.get')
-    def test_geocoding_fallback(self, mock_get):
-        """Test that geocoding falls back to current weather API when geocoding API returns no results"""
-        # First create empty geocoding response
-        empty_geocoding_response = MagicMock()
-        empty_geocoding_response.status_code = 200
-        empty_geocoding_response.json.return_value = []  # Empty response to trigger fallback
-        
-        # Create fallback current weather API response with coordinates
-        fallback_response = MagicMock()
-        fallback_response.status_code = 200
-        fallback_response.json.return_value = {
-            "coord": {"lat": 40.7128, "lon": -74.0060},
-            "weather": [{"description": "clear sky"}],
-            "main": {"temp": 15.0},
-            "name": "New York"
-        }
-        
-        # Create onecall API response for after coordinates are found
-        onecall_response = MagicMock()
-        onecall_response.status_code = 200
-        onecall_response.json.return_value = {
-            "lat": 40.7128,
-            "lon": -74.0060,
-            "timezone": "America/New_York",
-            "timezone_offset": -14400,
-            "current": {
-                "dt": 1617979000,
-                "temp": 15.2,
-                "feels_like": 14.3,
-                "humidity": 76,
-                "wind_speed": 2.06,
-                "wind_deg": 210,
-                "weather": [{"description": "clear sky"}],
-                "clouds": 1
-            },
-            "daily": [
-                {
-                    "dt": 1617979000,
-                    "temp": {"day": 15.0, "min": 9.0, "max": 17.0, "eve": 13.0, "morn": 10.0},
-                    "feels_like": {"day": 14.3, "night": 8.5, "eve": 12.5, "morn": 9.5},
-                    "humidity": 76,
-                    "wind_speed": 2.06,
-                    "wind_deg": 210,
-                    "weather": [{"description": "clear sky"}],
-                    "clouds": 1,
-                    "pop": 0.2,
-                    "summary": "Nice day"
-                }
-            ],
-            "hourly": []
-        }
-        
-        # Configure the mock to return different responses based on the URL
-        # First geocoding returns empty, then fallback to current weather API works, then onecall API works
-        call_count = [0]
-        
-        def side_effect(url, *args, **kwargs):
-            call_count[0] += 1
-            
-            if "onecall" in url:
-                return onecall_response
-            elif "geo/1.0/direct" in url:
-                return empty_geocoding_response
-            elif "data/2.5/weather" in url:
-                # This is the fallback API
-                return fallback_response
-            else:
-                return empty_geocoding_response
-        
-        mock_get.side_effect = side_effect
-        
-        # Call the function
-        result = weather_mcp_server.get_weather(
-            self.test_location, 
-            self.test_api_key, 
-            self.test_timezone_offset
-        )
-        
-        # Verify we got valid results indicating the fallback worked
-        self.assertIn('daily_forecasts', result)
-        self.assertIn('current', result)
-        
-        # Check that we called the APIs in the right order
-        # Should be at least 3 calls: geocoding, fallback, onecall
-        self.assertGreaterEqual(call_count[0], 3)
+    # Verify the error names the location and only the geocoding API was called
+    assert result == {'error': "Location not found: NonExistentLocation"}
+    assert mock_get.call_count == 1
 
 
 if __name__ == '__main__':
-    unittest.main()
+    sys.exit(pytest.main([__file__]))
@@ -1,10 +1,17 @@
 # weather_mcp_server.py
 from mcp.server.fastmcp import FastMCP
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional, Union
-import requests
-from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Optional, Union, Tuple, Callable, Awaitable, Hashable, TypeVar
+import asyncio
+from cachetools import TLRUCache, TTLCache
+import httpx
+import msgspec
+from datetime import date, timedelta
+from functools import lru_cache
+from urllib.parse import urlencode
+import importlib.util
 import os
+import time
 
 # Create MCP server instance
 mcp = FastMCP(
@@ -13,6 +20,84 @@ mcp = FastMCP(
     version="1.2.0"
 )
 
+# HTTP/2 needs the optional h2 package (installed by httpx[http2]); without it the client
+# falls back to HTTP/1.1 keep-alive instead of failing at import
+_HTTP2 = importlib.util.find_spec('h2') is not None
+
+# Shared async HTTP client so connections (and HTTP/2 streams) are reused across tool calls;
+# the keep-alive pool lets geocoding and One Call requests skip repeat TLS handshakes.
+# Connecting gets a short timeout of its own so an unreachable host fails fast
+_CLIENT = httpx.AsyncClient(
+    http2=_HTTP2,
+    timeout=httpx.Timeout(10.0, connect=3.0),
+    limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+)
+
+# Transient upstream failures (rate limiting, 5xx, connections that never open) are retried
+# with exponential backoff: 0.3s, 0.6s, 1.2s. A Retry-After header on the response takes
+# precedence, up to _MAX_RETRY_AFTER seconds; a longer wait is not worth holding the tool call
+# for, so that response is returned straight away
+_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+_MAX_RETRIES = 3
+_RETRY_BACKOFF = 0.3
+_MAX_RETRY_AFTER = 5
+
+# get_weather_many looks up at most this many locations at a time, across all concurrent tool
+# calls, so a long list doesn't burst through OpenWeatherMap's per-minute quota; longer
+# lists than _MAX_LOCATIONS are refused outright
+_LOOKUP_CONCURRENCY = 8
+_LOOKUP_SEMAPHORE = asyncio.Semaphore(_LOOKUP_CONCURRENCY)
+_MAX_LOCATIONS = 50
+
+# Upstream requests currently in progress, keyed by endpoint and cache key, so concurrent
+# lookups of the same data (e.g. via get_weather_many) wait on one request
+_IN_FLIGHT: Dict[Hashable, "asyncio.Future[Any]"] = {}
+
+# OpenWeatherMap API endpoints
+_ENDPOINTS = {
+    'direct': "https://api.openweathermap.org/geo/1.0/direct",
+    'onecall': "https://api.openweathermap.org/data/3.0/onecall",
+}
+
+# Geocoding results for a location name effectively never change, so keep the most
+# recently used ones in memory for a day and skip the geocoding round-trip on repeat lookups
+_GEO_CACHE: TTLCache[Tuple[str, str], Tuple[float, float]] = TTLCache(maxsize=1024, ttl=86400)
+
+# One Call data only changes every few minutes upstream; each response is kept for the
+# lifetime advertised by its Cache-Control header, or a short default when there is none.
+# Coordinates are rounded to this many decimal places (about 1 km) before requesting One
+# Call data, so nearby lookups (e.g. two spellings of the same city) share one response
+_ONECALL_COORD_PRECISION = 2
+_ONECALL_DEFAULT_TTL = 120
+_ONECALL_CACHE: TLRUCache[Tuple[float, float, str, str, str], Tuple[int, "OneCallResponse"]] = TLRUCache(
+    maxsize=4096,
+    ttu=lambda _key, value, now: now + value[0],
+)
+
+# One Call blocks each tool doesn't use; excluded blocks are neither transferred nor parsed
+_FORECAST_EXCLUDE = 'minutely,alerts'
+_CURRENT_EXCLUDE = 'minutely,hourly,daily,alerts'
+
+# Entries built from each One Call daily record: (local hour, temperature field). The first
+# is the record itself at its own timestamp; morning, afternoon and evening entries add
+# richer data for use cases like "when should I mow my lawn"
+_DAILY_SLOTS: Tuple[Tuple[Optional[int], str], ...] = (
+    (None, 'day'),
+    (9, 'morn'),    # Morning entry (9 AM)
+    (15, 'day'),    # Afternoon entry (3 PM)
+    (20, 'eve'),    # Evening entry (8 PM)
+)
+
+# Result type of a shared in-flight request
+T = TypeVar('T')
+
+# Day zero for the local day numbers used when formatting timestamps
+_EPOCH_DATE = date(1970, 1, 1)
+
+# Raised when the Geocoding API has no match for a location name
+class LocationNotFoundError(ValueError):
+    pass
+
 # Define data models
 class WindInfo(BaseModel):
     speed: str = Field(..., description="Wind speed in meters per second")
@@ -30,12 +115,97 @@ class WeatherEntry(BaseModel):
     rain: str = Field(..., description="Rainfall amount")
     clouds: str = Field(..., description="Cloud coverage percentage")
     pop: Optional[str] = Field(None, description="Probability of precipitation")
+    epoch: Optional[int] = Field(None, description="Unix timestamp of the weather data")
+    hour_local: Optional[int] = Field(None, description="Hour of the day (0-23) in the requested timezone")
 
 class DailyForecast(BaseModel):
     date: str = Field(..., description="Date of the forecast in YYYY-MM-DD format")
     entries: List[WeatherEntry] = Field(..., description="Weather entries for this day")
     summary: Optional[str] = Field(None, description="Summary of the day's weather")
 
+# Define OpenWeatherMap response schemas. Only the fields the server reads are declared;
+# msgspec decodes straight into these structs, skipping unknown fields and filling in the
+# same defaults the dict lookups used to fall back to
+Number = Union[int, float]
+
+class WeatherCondition(msgspec.Struct):
+    description: str = 'Unknown'
+
+class OneCallCurrent(msgspec.Struct):
+    dt: int = 0
+    temp: Number = 0
+    feels_like: Number = 0
+    humidity: Number = 0
+    wind_speed: Number = 0
+    wind_deg: Number = 0
+    clouds: Number = 0
+    weather: List[WeatherCondition] = msgspec.field(default_factory=lambda: [WeatherCondition()])
+    rain: Optional[Dict[str, Number]] = None
+
+class OneCallHourly(OneCallCurrent):
+    pop: Number = 0
+
+class DailyTemperature(msgspec.Struct):
+    day: Number = 0
+    min: Number = 0
+    max: Number = 0
+    night: Number = 0
+    eve: Number = 0
+    morn: Number = 0
+
+class DailyFeelsLike(msgspec.Struct):
+    day: Number = 0
+    night: Number = 0
+    eve: Number = 0
+    morn: Number = 0
+
+class OneCallDaily(msgspec.Struct):
+    dt: int = 0
+    temp: DailyTemperature = msgspec.field(default_factory=DailyTemperature)
+    feels_like: DailyFeelsLike = msgspec.field(default_factory=DailyFeelsLike)
+    humidity: Number = 0
+    wind_speed: Number = 0
+    wind_deg: Number = 0
+    clouds: Number = 0
+    pop: Number = 0
+    weather: List[WeatherCondition] = msgspec.field(default_factory=lambda: [WeatherCondition()])
+    rain: Optional[Number] = None
+    summary: str = ''
+
+class OneCallResponse(msgspec.Struct):
+    current: OneCallCurrent = msgspec.field(default_factory=OneCallCurrent)
+    hourly: List[OneCallHourly] = []
+    daily: List[OneCallDaily] = []
+
+class Coordinates(msgspec.Struct):
+    lat: float
+    lon: float
+
+# Internal forecast entry records, mirroring WindInfo and WeatherEntry. Entries are built as
+# structs while the forecast is assembled and converted to plain dicts once, on return
+class EntryWind(msgspec.Struct):
+    speed: str
+    direction: str
+
+class ForecastEntry(msgspec.Struct):
+    time: str
+    temperature: str
+    feels_like: str
+    temp_min: str
+    temp_max: str
+    weather_condition: str
+    humidity: str
+    wind: EntryWind
+    rain: str
+    clouds: str
+    pop: str
+    epoch: int
+    hour_local: int
+
+# Decoders are built once per response type rather than on every request
+_GEOCODING_DECODER = msgspec.json.Decoder(List[Coordinates])
+_ONECALL_DECODER = msgspec.json.Decoder(OneCallResponse)
+
 class WeatherForecast(BaseModel):
     daily_forecasts: List[DailyForecast] = Field(..., description="Weather forecasts for up to 8 days, including today")
     current: WeatherEntry = Field(..., description="Current weather information")
@@ -60,8 +230,107 @@ def get_api_key(provided_key: Optional[str] = None) -> str:
 
     raise ValueError("No API key provided and no OPENWEATHER_API_KEY found in environment variables")
 
+# Function to build an API request URL
+def build_url(endpoint: str, **params: Any) -> str:
+    """
+    Build an OpenWeatherMap API URL with URL-encoded query parameters
+
+    Parameters:
+        endpoint: Endpoint name, either "direct" or "onecall"
+        params: Query parameters to append
+
+    Returns:
+        Full request URL
+    """
+    return f"{_ENDPOINTS[endpoint]}?{urlencode(params, safe=',')}"
+
+# Function to send a GET request, retrying transient failures
+async def get_with_retries(url: str) -> httpx.Response:
+    """
+    Send a GET request with the shared client, retrying rate-limit and server errors with backoff
+    (or after the delay the server asks for in a Retry-After header)
+
+    Parameters:
+        url: Request URL
+
+    Returns:
+        HTTP response; the last one received if every attempt hit a retryable status, or the
+        first one asking to retry later than _MAX_RETRY_AFTER seconds
+    """
+    for attempt in range(_MAX_RETRIES):
+        delay = _RETRY_BACKOFF * 2 ** attempt
+        try:
+            response = await _CLIENT.get(url)
+        except (httpx.ConnectError, httpx.ConnectTimeout):
+            pass
+        else:
+            if response.status_code not in _RETRY_STATUSES:
+                return response
+            retry_after = get_retry_after(response.headers.get('retry-after'))
+            if retry_after is not None:
+                if retry_after > _MAX_RETRY_AFTER:
+                    return response
+                delay = retry_after
+        await asyncio.sleep(delay)
+
+    # Final attempt: whatever comes back (or goes wrong) is the caller's to handle
+    return await _CLIENT.get(url)
+
+# Function to read the delay a server asks for before retrying
+def get_retry_after(retry_after: Optional[str]) -> Optional[int]:
+    """
+    Get the number of seconds to wait from a Retry-After response header
+
+    Parameters:
+        retry_after: Value of the Retry-After header, if present
+
+    Returns:
+        Seconds to wait, or None if the header is missing or not a number of seconds
+        (HTTP-date values are treated as missing and fall back to the usual backoff)
+    """
+    if retry_after is None:
+        return None
+    try:
+        return max(int(retry_after), 0)
+    except ValueError:
+        return None
+
+# Function to decode an API response body
+def decode_response(response: httpx.Response, decoder: "msgspec.json.Decoder[T]") -> T:
+    """
+    Decode and validate the JSON body of an API response with msgspec, skipping httpx's stdlib decoder
+
+    Parameters:
+        response: HTTP response from the OpenWeatherMap API
+        decoder: msgspec decoder for the expected response type
+
+    Returns:
+        Response body decoded into the decoder's type
+    """
+    return decoder.decode(response.content)
+
+# Function to share one in-flight upstream request between concurrent callers
+async def share_in_flight(key: Hashable, fetch: Callable[[], Awaitable[T]]) -> T:
+    """
+    Run fetch() once for all concurrent callers asking for the same key
+
+    Parameters:
+        key: Hashable identifier of the upstream request
+        fetch: Zero-argument function returning the coroutine that performs the request
+
+    Returns:
+        Result of the shared fetch() call
+    """
+    task: Optional["asyncio.Future[T]"] = _IN_FLIGHT.get(key)
+    if task is None:
+        task = asyncio.ensure_future(fetch())
+        _IN_FLIGHT[key] = task
+        task.add_done_callback(lambda _task: _IN_FLIGHT.pop(key, None))
+    # Shielded so one caller being cancelled doesn't cancel the request for the others
+    return await asyncio.shield(task)
+
 # Function to get location coordinates using Geocoding API
-def get_coordinates(location, api_key):
+async def get_coordinates(location: str, api_key: str) -> Tuple[float, float]:
     """
     Get geographic coordinates for a location name using Geocoding API
 
@@ -72,46 +341,153 @@ def get_coordinates(location, api_key):
     Returns:
         Tuple of (latitude, longitude)
     """
-    try:
-        # First try the Geocoding API
-        geocode_url = f"https://api.openweathermap.org/geo/1.0/direct?q={location}&limit=1&appid={api_key}"
-        response = requests.get(geocode_url)
-        response.raise_for_status()
-        data = response.json()
+    cache_key = (location.strip().lower(), api_key)
+    coords = _GEO_CACHE.get(cache_key)
+    if coords is not None:
+        return coords
+
+    return await share_in_flight(('direct',) + cache_key, lambda: fetch_coordinates(location, api_key, cache_key))
+
+# Function to look up location coordinates upstream
+async def fetch_coordinates(location: str, api_key: str, cache_key: Tuple[str, str]) -> Tuple[float, float]:
+    """
+    Request geographic coordinates from the Geocoding API and store them in the geocoding cache
 
-        if data and len(data) > 0:
-            return data[0]['lat'], data[0]['lon']
+    Parameters:
+        location: Location name as string
+        api_key: OpenWeatherMap API key
+        cache_key: Geocoding cache key to store the result under
 
-        # Fallback to current weather API if geocoding fails
-        print("Geocoding API failed, falling back to current weather API for coordinates")
-        fallback_url = f"https://api.openweathermap.org/data/2.5/weather?q={location}&appid={api_key}&units=metric"
-        response = requests.get(fallback_url)
+    Returns:
+        Tuple of (latitude, longitude)
+    """
+    try:
+        # First try the Geocoding API
+        geocode_url = build_url('direct', q=location, limit=1, appid=api_key)
+        response = await get_with_retries(geocode_url)
         response.raise_for_status()
-        data = response.json()
+        data = decode_response(response, _GEOCODING_DECODER)
 
-        return data['coord']['lat'], data['coord']['lon']
+        # An empty result means the location is unknown; any other API would not find it either
+        if not data:
+            raise LocationNotFoundError(f"Location not found: {location}")
+        coords = data[0].lat, data[0].lon
     except Exception as e:
         print(f"Error getting coordinates: {str(e)}")
         raise
 
+    _GEO_CACHE[cache_key] = coords
+    return coords
+
+# Function to work out how long a response may be cached
+def get_ttl_for_cache_control_header(cache_control: Optional[str], default: int = _ONECALL_DEFAULT_TTL) -> int:
+    """
+    Get the cache lifetime allowed by a Cache-Control response header
+
+    Parameters:
+        cache_control: Value of the Cache-Control header (optional)
+        default: Lifetime in seconds to use when the header doesn't specify one
+
+    Returns:
+        Lifetime in seconds, 0 if the response must not be cached
+    """
+    if not cache_control:
+        return default
+
+    for directive in cache_control.lower().split(','):
+        name, _, value = directive.strip().partition('=')
+        if name in ('no-store', 'no-cache'):
+            return 0
+        if name == 'max-age':
+            try:
+                return max(int(value.strip('" ')), 0)
+            except ValueError:
+                return default
+
+    return default
+
+# Function to get weather data using One Call API 3.0
+async def get_onecall_data(lat: float, lon: float, api_key: str, exclude: str = _FORECAST_EXCLUDE) -> "OneCallResponse":
+    """
+    Get raw One Call API 3.0 data for a coordinate, reusing a cached response while it is fresh
+
+    Parameters:
+        lat: Latitude (rounded to _ONECALL_COORD_PRECISION decimal places before the request)
+        lon: Longitude (rounded likewise)
+        api_key: OpenWeatherMap API key
+        exclude: Comma-separated One Call blocks to leave out of the response
+
+    Returns:
+        Decoded One Call API response as a OneCallResponse struct
+    """
+    lat = round(lat, _ONECALL_COORD_PRECISION)
+    lon = round(lon, _ONECALL_COORD_PRECISION)
+    cache_key = (lat, lon, 'metric', exclude, api_key)
+    cached = _ONECALL_CACHE.get(cache_key)
+    if cached is not None:
+        return cached[1]
+
+    onecall_url = build_url('onecall', lat=lat, lon=lon, appid=api_key, units='metric', exclude=exclude)
+    return await share_in_flight(('onecall',) + cache_key, lambda: fetch_onecall_data(onecall_url, cache_key))
+
+# Function to request One Call data upstream
+async def fetch_onecall_data(onecall_url: str, cache_key: Tuple[float, float, str, str, str]) -> "OneCallResponse":
+    """
+    Request One Call API 3.0 data and store it in the One Call cache for as long as the response allows
+
+    Parameters:
+        onecall_url: One Call request URL
+        cache_key: One Call cache key to store the result under
+
+    Returns:
+        Decoded One Call API response as a OneCallResponse struct
+    """
+    response = await get_with_retries(onecall_url)
+    response.raise_for_status()
+    data = decode_response(response, _ONECALL_DECODER)
+
+    ttl = get_ttl_for_cache_control_header(response.headers.get('cache-control'))
+    if ttl > 0:
+        _ONECALL_CACHE[cache_key] = (ttl, data)
+    return data
+
+# Function to format a day number as a date string
+@lru_cache(maxsize=256)
+def format_day_number(day_number: int) -> str:
+    """
+    Convert a day number (days since 1970-01-01) to a date string; a forecast only spans a
+    handful of distinct days, so results are memoized across calls
+
+    Parameters:
+        day_number: Days since the Unix epoch
+
+    Returns:
+        Formatted date string ("YYYY-MM-DD")
+    """
+    return (_EPOCH_DATE + timedelta(days=day_number)).isoformat()
+
 # Function to format timestamp to human-readable time
-def format_timestamp(ts, tz_offset):
+def format_timestamp(ts: int, offset_sec: int) -> str:
     """
-    Convert Unix timestamp to human-readable time
+    Convert Unix timestamp to human-readable local time using integer arithmetic,
+    without building datetime objects or calling strftime
 
     Parameters:
         ts: Unix timestamp
-        tz_offset: Timezone offset in hours
+        offset_sec: Timezone offset in seconds
 
     Returns:
-        Formatted time string
+        Formatted time string ("YYYY-MM-DD HH:MM:SS")
     """
-    tz = timezone(timedelta(hours=tz_offset))
-    dt = datetime.fromtimestamp(ts, tz)
-    return dt.strftime('%Y-%m-%d %H:%M:%S')
+    day_number, seconds = divmod(ts + offset_sec, 86400)
+    date_str = format_day_number(day_number)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    return f"{date_str} {hours:02d}:{minutes:02d}:{seconds:02d}"
 
 # Core weather forecast function using One Call API 3.0
-def get_weather_forecast(present_location, time_zone_offset, api_key=None):
+async def get_weather_forecast(present_location: str, time_zone_offset: float, api_key: Optional[str] = None,
+                               only_current: bool = False) -> Dict[str, Any]:
     # Get API key
     try:
         api_key = get_api_key(api_key)
@@ -120,181 +496,151 @@ def get_weather_forecast(present_location, time_zone_offset, api_key=None):
 
     try:
         # Get geographic coordinates
-        lat, lon = get_coordinates(present_location, api_key)
-
-        # Call One Call API 3.0
-        onecall_url = f"https://api.openweathermap.org/data/3.0/onecall?lat={lat}&lon={lon}&appid={api_key}&units=metric"
+        lat, lon = await get_coordinates(present_location, api_key)
 
-        response = requests.get(onecall_url)
-        response.raise_for_status()
-        data = response.json()
+        # Call One Call API 3.0, leaving out the forecast blocks when only current weather is wanted
+        data = await get_onecall_data(lat, lon, api_key, _CURRENT_EXCLUDE if only_current else _FORECAST_EXCLUDE)
 
         # Set timezone
-        tz = timezone(timedelta(hours=time_zone_offset))
+        offset_sec = int(round(time_zone_offset * 3600))
 
         # Process current weather
-        current = data.get('current', {})
-        current_weather = {
-            'time': format_timestamp(current.get('dt', 0), time_zone_offset),
-            'temperature': f"{current.get('temp', 0)} °C",
-            'feels_like': f"{current.get('feels_like', 0)} °C",
-            'temp_min': "N/A",  # One Call doesn't provide min/max in current
-            'temp_max': "N/A",
-            'weather_condition': current.get('weather', [{}])[0].get('description', 'Unknown'),
-            'humidity': f"{current.get('humidity', 0)}%",
-            'wind': {
-                'speed': f"{current.get('wind_speed', 0)} m/s",
-                'direction': f"{current.get('wind_deg', 0)} degrees"
-            },
-            'rain': f"{current.get('rain', {}).get('1h', 0)} mm/h" if 'rain' in current else 'No rain',
-            'clouds': f"{current.get('clouds', 0)}%",
-            'pop': "N/A"  # One Call doesn't provide precipitation probability in current
-        }
-
-        # Process daily forecasts
-        forecasts_by_date = {}
-
-        for day in data.get('daily', []):
-            dt = datetime.fromtimestamp(day.get('dt', 0), tz)
-            date_str = dt.date().strftime('%Y-%m-%d')
-
-            # Initialize this date in the dictionary if needed
-            if date_str not in forecasts_by_date:
-                forecasts_by_date[date_str] = {
-                    'entries': [],
-                    'summary': day.get('summary', '')
-                }
-
-            # Create a forecast entry for this day
-            forecast_entry = {
-                'time': format_timestamp(day.get('dt', 0), time_zone_offset),
-                'temperature': f"{day.get('temp', {}).get('day', 0)} °C",
-                'feels_like': f"{day.get('feels_like', {}).get('day', 0)} °C",
-                'temp_min': f"{day.get('temp', {}).get('min', 0)} °C",
-                'temp_max': f"{day.get('temp', {}).get('max', 0)} °C",
-                'weather_condition': day.get('weather', [{}])[0].get('description', 'Unknown'),
-                'humidity': f"{day.get('humidity', 0)}%",
-                'wind': {
-                    'speed': f"{day.get('wind_speed', 0)} m/s",
-                    'direction': f"{day.get('wind_deg', 0)} degrees"
-                },
-                'rain': f"{day.get('rain', 0)} mm" if 'rain' in day else 'No rain',
-                'clouds': f"{day.get('clouds', 0)}%",
-                'pop': f"{day.get('pop', 0) * 100}%"  # Convert to percentage
-            }
-
-            forecasts_by_date[date_str]['entries'].append(forecast_entry)
-
-            # Add morning, afternoon, evening entries for richer data
-            # These entries help with use cases like "when should I mow my lawn"
-            day_temps = day.get('temp', {})
-            feels_like = day.get('feels_like', {})
-
-            # Morning entry (9 AM)
-            morning_time = dt.replace(hour=9, minute=0, second=0)
-            forecasts_by_date[date_str]['entries'].append({
-                'time': morning_time.strftime('%Y-%m-%d %H:%M:%S'),
-                'temperature': f"{day_temps.get('morn', 0)} °C",
-                'feels_like': f"{feels_like.get('morn', 0)} °C",
-                'temp_min': f"{day_temps.get('min', 0)} °C",
-                'temp_max': f"{day_temps.get('max', 0)} °C",
-                'weather_condition': day.get('weather', [{}])[0].get('description', 'Unknown'),
-                'humidity': f"{day.get('humidity', 0)}%",
-                'wind': {
-                    'speed': f"{day.get('wind_speed', 0)} m/s",
-                    'direction': f"{day.get('wind_deg', 0)} degrees"
-                },
-                'rain': f"{day.get('rain', 0)} mm" if 'rain' in day else 'No rain',
-                'clouds': f"{day.get('clouds', 0)}%",
-                'pop': f"{day.get('pop', 0) * 100}%"
-            })
-
-            # Afternoon entry (15 PM)
-            afternoon_time = dt.replace(hour=15, minute=0, second=0)
-            forecasts_by_date[date_str]['entries'].append({
-                'time': afternoon_time.strftime('%Y-%m-%d %H:%M:%S'),
-                'temperature': f"{day_temps.get('day', 0)} °C",
-                'feels_like': f"{feels_like.get('day', 0)} °C",
-                'temp_min': f"{day_temps.get('min', 0)} °C",
-                'temp_max': f"{day_temps.get('max', 0)} °C",
-                'weather_condition': day.get('weather', [{}])[0].get('description', 'Unknown'),
-                'humidity': f"{day.get('humidity', 0)}%",
-                'wind': {
-                    'speed': f"{day.get('wind_speed', 0)} m/s",
-                    'direction': f"{day.get('wind_deg', 0)} degrees"
-                },
-                'rain': f"{day.get('rain', 0)} mm" if 'rain' in day else 'No rain',
-                'clouds': f"{day.get('clouds', 0)}%",
-                'pop': f"{day.get('pop', 0) * 100}%"
-            })
-
-            # Evening entry (20 PM)
-            evening_time = dt.replace(hour=20, minute=0, second=0)
-            forecasts_by_date[date_str]['entries'].append({
-                'time': evening_time.strftime('%Y-%m-%d %H:%M:%S'),
-                'temperature': f"{day_temps.get('eve', 0)} °C",
-                'feels_like': f"{feels_like.get('eve', 0)} °C",
-                'temp_min': f"{day_temps.get('min', 0)} °C",
-                'temp_max': f"{day_temps.get('max', 0)} °C",
-                'weather_condition': day.get('weather', [{}])[0].get('description', 'Unknown'),
-                'humidity': f"{day.get('humidity', 0)}%",
-                'wind': {
-                    'speed': f"{day.get('wind_speed', 0)} m/s",
-                    'direction': f"{day.get('wind_deg', 0)} degrees"
-                },
-                'rain': f"{day.get('rain', 0)} mm" if 'rain' in day else 'No rain',
-                'clouds': f"{day.get('clouds', 0)}%",
-                'pop': f"{day.get('pop', 0) * 100}%"
-            })
+        current = data.current
+        ts = current.dt
+        current_weather = ForecastEntry(
+            time=format_timestamp(ts, offset_sec),
+            temperature=f"{current.temp} °C",
+            feels_like=f"{current.feels_like} °C",
+            temp_min="N/A",  # One Call doesn't provide min/max in current
+            temp_max="N/A",
+            weather_condition=current.weather[0].description,
+            humidity=f"{current.humidity}%",
+            wind=EntryWind(
+                speed=f"{current.wind_speed} m/s",
+                direction=f"{current.wind_deg} degrees"
+            ),
+            rain=f"{current.rain.get('1h', 0)} mm/h" if current.rain is not None else 'No rain',
+            clouds=f"{current.clouds}%",
+            pop="N/A",  # One Call doesn't provide precipitation probability in current
+            epoch=ts,
+            hour_local=(ts + offset_sec) // 3600 % 24
+        )
+
+        # Skip building the forecast entirely when the caller only wants current weather
+        if only_current:
+            return {'current': msgspec.to_builtins(current_weather)}
+
+        # Process daily forecasts. One Call returns them in chronological order, so the list is
+        # built in its final order; hourly entries find their day's entry list by date
+        daily_forecasts: List[Dict[str, Any]] = []
+        entries_by_date: Dict[str, List[ForecastEntry]] = {}
+
+        for day in data.daily:
+            ts = day.dt
+            day_temps = day.temp
+            feels_like = day.feels_like
+            time_str = format_timestamp(ts, offset_sec)
+            date_str = time_str[:10]
+            # Unix timestamp of local midnight, for the fixed-hour entries below
+            midnight_ts = ts - (ts + offset_sec) % 86400
+
+            # Start a new daily forecast if this is the first entry for this date
+            entries = entries_by_date.get(date_str)
+            if entries is None:
+                entries = entries_by_date[date_str] = []
+                daily_forecasts.append({
+                    'date': date_str,
+                    'entries': entries,
+                    'summary': day.summary
+                })
+
+            # Values shared by all four entries for this day, formatted once
+            temp_min = f"{day_temps.min} °C"
+            temp_max = f"{day_temps.max} °C"
+            weather_condition = day.weather[0].description
+            humidity = f"{day.humidity}%"
+            wind_speed = f"{day.wind_speed} m/s"
+            wind_direction = f"{day.wind_deg} degrees"
+            rain = f"{day.rain} mm" if day.rain is not None else 'No rain'
+            clouds = f"{day.clouds}%"
+            pop = f"{day.pop * 100}%"  # Convert to percentage
+
+            # Create the forecast entries for this day, one per slot
+            for slot_hour, temp_key in _DAILY_SLOTS:
+                if slot_hour is None:
+                    slot_time, slot_ts, hour_local = time_str, ts, (ts + offset_sec) // 3600 % 24
+                else:
+                    slot_time = f"{date_str} {slot_hour:02d}:00:00"
+                    slot_ts, hour_local = midnight_ts + slot_hour * 3600, slot_hour
+                entries.append(ForecastEntry(
+                    time=slot_time,
+                    temperature=f"{getattr(day_temps, temp_key)} °C",
+                    feels_like=f"{getattr(feels_like, temp_key)} °C",
+                    temp_min=temp_min,
+                    temp_max=temp_max,
+                    weather_condition=weather_condition,
+                    humidity=humidity,
+                    wind=EntryWind(
+                        speed=wind_speed,
+                        direction=wind_direction
+                    ),
+                    rain=rain,
+                    clouds=clouds,
+                    pop=pop,
+                    epoch=slot_ts,
+                    hour_local=hour_local
+                ))
 
         # Process hourly forecasts and add to appropriate days
-        for hour in data.get('hourly', []):
-            dt = datetime.fromtimestamp(hour.get('dt', 0), tz)
-            date_str = dt.date().strftime('%Y-%m-%d')
+        # Only the first 48 hours are included (to keep the response size reasonable)
+        cutoff_ts = time.time() + 48 * 3600
+        for hour in data.hourly:
+            ts = hour.dt
+            if ts > cutoff_ts:
+                continue
+
+            time_str = format_timestamp(ts, offset_sec)
+            date_str = time_str[:10]
 
             # Skip if we don't have this date (shouldn't happen but just in case)
-            if date_str not in forecasts_by_date:
+            entries = entries_by_date.get(date_str)
+            if entries is None:
                 continue
 
             # Add the hourly forecast to the appropriate day
-            hourly_entry = {
-                'time': format_timestamp(hour.get('dt', 0), time_zone_offset),
-                'temperature': f"{hour.get('temp', 0)} °C",
-                'feels_like': f"{hour.get('feels_like', 0)} °C",
-                'temp_min': "N/A",  # Hourly doesn't have min/max
-                'temp_max': "N/A",
-                'weather_condition': hour.get('weather', [{}])[0].get('description', 'Unknown'),
-                'humidity': f"{hour.get('humidity', 0)}%",
-                'wind': {
-                    'speed': f"{hour.get('wind_speed', 0)} m/s",
-                    'direction': f"{hour.get('wind_deg', 0)} degrees"
-                },
-                'rain': f"{hour.get('rain', {}).get('1h', 0)} mm/h" if 'rain' in hour else 'No rain',
-                'clouds': f"{hour.get('clouds', 0)}%",
-                'pop': f"{hour.get('pop', 0) * 100}%"  # Convert to percentage
-            }
-
-            # Only add hourly entries for the first 48 hours (to keep the response size reasonable)
-            current_time = datetime.now(tz)
-            if (dt - current_time).total_seconds() <= 48 * 3600:  # 48 hours in seconds
-                forecasts_by_date[date_str]['entries'].append(hourly_entry)
-
-        # Convert dictionary to list of daily forecasts
-        daily_forecasts = []
-        for date_str, forecast in sorted(forecasts_by_date.items()):
-            daily_forecasts.append({
-                'date': date_str,
-                'entries': forecast['entries'],
-                'summary': forecast.get('summary', '')
-            })
-
-        # Return structured forecast data
-        return {
+            hourly_entry = ForecastEntry(
+                time=time_str,
+                temperature=f"{hour.temp} °C",
+                feels_like=f"{hour.feels_like} °C",
+                temp_min="N/A",  # Hourly doesn't have min/max
+                temp_max="N/A",
+                weather_condition=hour.weather[0].description,
+                humidity=f"{hour.humidity}%",
+                wind=EntryWind(
+                    speed=f"{hour.wind_speed} m/s",
+                    direction=f"{hour.wind_deg} degrees"
+                ),
+                rain=f"{hour.rain.get('1h', 0)} mm/h" if hour.rain is not None else 'No rain',
+                clouds=f"{hour.clouds}%",
+                pop=f"{hour.pop * 100}%",  # Convert to percentage
+                epoch=ts,
+                hour_local=(ts + offset_sec) // 3600 % 24
+            )
+
+            entries.append(hourly_entry)
+
+        # Return structured forecast data, converting the entry structs to plain dicts in one pass
+        forecast: Dict[str, Any] = msgspec.to_builtins({
             'daily_forecasts': daily_forecasts,
             'current': current_weather
-        }
-    except requests.RequestException as e:
+        })
+        return forecast
+    except LocationNotFoundError as e:
+        return {'error': str(e)}
+    except httpx.HTTPError as e:
         return {'error': f"Request error: {str(e)}"}
+    except msgspec.ValidationError as e:
+        return {'error': f"Data structure error: {str(e)}"}
     except ValueError as e:
         return {'error': f"JSON parsing error: {str(e)}"}
     except KeyError as e:
@@ -304,7 +650,7 @@ def get_weather_forecast(present_location, time_zone_offset, api_key=None):
 
 # Define MCP tools
 @mcp.tool()
-def get_weather(location: str, api_key: Optional[str] = None, timezone_offset: float = 0) -> Dict[str, Any]:
+async def get_weather(location: str, api_key: Optional[str] = None, timezone_offset: float = 0) -> Dict[str, Any]:
     """
     Get comprehensive weather data for a location including current weather and 8-day forecast with detailed information
 
@@ -318,10 +664,10 @@ def get_weather(location: str, api_key: Optional[str] = None, timezone_offset: f
         with morning, afternoon, and evening data points for each day
     """
     # Call weather forecast function
-    return get_weather_forecast(location, timezone_offset, api_key)
+    return await get_weather_forecast(location, timezone_offset, api_key)
 
 @mcp.tool()
-def get_current_weather(location: str, api_key: Optional[str] = None, timezone_offset: float = 0) -> Dict[str, Any]:
+async def get_current_weather(location: str, api_key: Optional[str] = None, timezone_offset: float = 0) -> Dict[str, Any]:
     """
     Get current weather for a specified location
 
@@ -333,8 +679,8 @@ def get_current_weather(location: str, api_key: Optional[str] = None, timezone_o
     Returns:
         Current weather information
     """
-    # Get full weather information
-    full_weather = get_weather(location, api_key, timezone_offset)
+    # Get weather information without the forecast we would discard
+    full_weather = await get_weather_forecast(location, timezone_offset, api_key, only_current=True)
 
     # Check if an error occurred
     if 'error' in full_weather:
@@ -342,10 +688,37 @@ def get_current_weather(location: str, api_key: Optional[str] = None, timezone_o
 
     # Only return current weather
     if 'current' in full_weather:
-        return full_weather['current']
+        current: Dict[str, Any] = full_weather['current']
+        return current
     else:
         return {"error": "Unable to get current weather information"}
 
+@mcp.tool()
+async def get_weather_many(locations: List[str], api_key: Optional[str] = None, timezone_offset: float = 0) -> Dict[str, Any]:
+    """
+    Get comprehensive weather data for several locations at once, fetching them concurrently
+
+    Parameters:
+        locations: List of location names, e.g., ["Beijing", "New York", "Tokyo"]
+        api_key: OpenWeatherMap API key (optional, will read from environment variable if not provided)
+        timezone_offset: Timezone offset in hours, applied to every location. Default is 0 (UTC time)
+
+    Returns:
+        Dictionary mapping each location name to the same data get_weather returns for it
+        (or an error dictionary if that location failed)
+    """
+    if len(locations) > _MAX_LOCATIONS:
+        return {'error': f"Too many locations: at most {_MAX_LOCATIONS} can be requested at once"}
+
+    # Look up to _LOOKUP_CONCURRENCY locations at a time; they share the client's connection
+    # pool and response caches
+    async def get_limited(location: str) -> Dict[str, Any]:
+        async with _LOOKUP_SEMAPHORE:
+            return await get_weather_forecast(location, timezone_offset, api_key)
+
+    results = await asyncio.gather(*(get_limited(location) for location in locations))
+    return dict(zip(locations, results))
+
 # Start server
 if __name__ == "__main__":
     # Check if environment variable is set and print log information